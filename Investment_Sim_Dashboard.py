@@ -1,14 +1,15 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import date, datetime
 import warnings
-import requests
 import json
+import os
 warnings.filterwarnings('ignore')
 
+# yfinance (ticker info), matplotlib and requests are imported where they are used so the
+# first script run in a process renders the page before loading them; later reruns find
+# them in sys.modules either way
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="Investment Regret Simulator",
@@ -153,6 +154,7 @@ def validate_ticker_with_cache(ticker):
         return st.session_state.ticker_info_cache[ticker]
     
     try:
+        import yfinance as yf
         stock_info = yf.Ticker(ticker)
         info = stock_info.info
         
@@ -172,32 +174,64 @@ def validate_ticker_with_cache(ticker):
         st.session_state.ticker_info_cache[ticker] = result
         return result
 
-def call_investment_api(ticker, start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment, api_base_url="http://localhost:8001"):
-    """Call the FastAPI backend for investment simulation"""
-    try:
-        payload = {
-            "ticker": ticker,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat(),
-            "monthly_investment_amount": monthly_investment_amount,
-            "starting_amount": starting_amount,
-            "day_of_investment": day_of_investment
-        }
-        
-        response = requests.post(f"{api_base_url}/simulate", json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            return response.json(), None
-        else:
-            error_detail = response.json().get("detail", "Unknown error")
-            return None, f"API Error ({response.status_code}): {error_detail}"
-            
-    except requests.exceptions.ConnectionError:
-        return None, "Could not connect to FastAPI server. Make sure it's running on http://localhost:8001"
-    except requests.exceptions.Timeout:
-        return None, "API request timed out. The server might be overloaded."
-    except Exception as e:
-        return None, f"Error calling API: {str(e)}"
+# Backend settings, overridable from the environment
+API_BASE_URL = os.environ.get("INVESTMENT_API_URL", "http://localhost:8001").rstrip("/")
+API_CONNECT_TIMEOUT = float(os.environ.get("INVESTMENT_API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.environ.get("INVESTMENT_API_READ_TIMEOUT", "30"))
+API_MAX_RETRIES = int(os.environ.get("INVESTMENT_API_MAX_RETRIES", "3"))
+API_TOTAL_DEADLINE = float(os.environ.get("INVESTMENT_API_DEADLINE", "45"))
+API_RETRY_BACKOFF = 0.5
+API_RESPONSE_CACHE_SIZE = 8
+
+# Last responses and their ETags, so reruns can be revalidated with If-None-Match
+if 'api_response_cache' not in st.session_state:
+    st.session_state.api_response_cache = {}
+
+@st.cache_resource
+def get_api_session():
+    """Shared keep-alive HTTP session, reused across Streamlit reruns"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def call_investment_api(ticker, start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment, api_base_url=API_BASE_URL):
+    """Call the FastAPI backend for investment simulation, revalidating earlier responses by ETag"""
+    from api_client import post_simulation
+
+    payload = {
+        "ticker": ticker,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "monthly_investment_amount": monthly_investment_amount,
+        "starting_amount": starting_amount,
+        "day_of_investment": day_of_investment
+    }
+    response_cache = st.session_state.api_response_cache
+    cache_key = json.dumps(payload, sort_keys=True)
+
+    result, error, etag = post_simulation(
+        get_api_session(),
+        api_base_url,
+        payload,
+        cached=response_cache.get(cache_key),
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=API_READ_TIMEOUT,
+        max_retries=API_MAX_RETRIES,
+        retry_backoff=API_RETRY_BACKOFF,
+        deadline_seconds=API_TOTAL_DEADLINE
+    )
+
+    if result is not None and etag:
+        response_cache.pop(cache_key, None)
+        response_cache[cache_key] = (etag, result)
+        while len(response_cache) > API_RESPONSE_CACHE_SIZE:
+            response_cache.pop(next(iter(response_cache)))
+    return result, error
 
 # App title
 st.markdown('<h1 class="main-header">📈 Historical Investment Regret Simulator Dashboard</h1>', unsafe_allow_html=True)
@@ -214,7 +248,7 @@ with input_col:
     st.markdown("#### 📊 How could you have invested?")
     
     # API backend info
-    st.info("🚀 Using FastAPI backend (http://localhost:8001)")
+    st.info(f"🚀 Using FastAPI backend ({API_BASE_URL})")
     
     # Row 1: Stock ticker search and selection
     ticker_col1, ticker_col2 = st.columns(2)
@@ -375,30 +409,14 @@ with result_col:
                 cagr = api_result['cagr']
                 num_months = api_result['num_months']
                 
-                # For charting, we still need to fetch the stock data locally
-                # (API doesn't return detailed time series data in the current format)
-                with st.spinner('📊 Fetching chart data...'):
-                    stock_data = yf.download(ticker, start=start_date - pd.Timedelta(days=7), end=end_date)
-                    if not stock_data.empty and 'Close' in stock_data.columns:
-                        # Prepare data for charting (simplified version)
-                        stock_data = stock_data[['Close']].round(2)
-                        date_range = pd.date_range(start=start_date - pd.Timedelta(days=7), end=end_date)
-                        stock_data = stock_data.reindex(date_range)
-                        stock_data.fillna(method='ffill', inplace=True)
-                        stock_data = stock_data[(stock_data.index >= pd.to_datetime(start_date)) & (stock_data.index <= pd.to_datetime(end_date))]
-                        stock_data.columns = ['Close']
-                        
-                        # Reconstruct investment data for charting
-                        stock_data['mnth_inv_amt'] = 0.0
-                        for date_idx in stock_data.index:
-                            if date_idx.day == day_of_investment:
-                                stock_data.at[date_idx, 'mnth_inv_amt'] = monthly_investment_amount
-                        stock_data.at[stock_data.index[0], 'mnth_inv_amt'] += starting_amount
-                        
-                        stock_data['stocks_purchased'] = stock_data['mnth_inv_amt'] / stock_data['Close']
-                        stock_data['cumulative_stocks'] = stock_data['stocks_purchased'].cumsum()
-                        stock_data['total_value'] = stock_data['cumulative_stocks'] * stock_data['Close']
-                        stock_data['total_investment'] = stock_data['mnth_inv_amt'].cumsum()
+                # Chart straight from the time series the API returned, so it matches the metrics
+                simulation_data = api_result['simulation_data']
+                stock_data = pd.DataFrame({
+                    'Close': simulation_data['close_prices'],
+                    'total_value': simulation_data['total_value'],
+                    'total_investment': simulation_data['total_investment'],
+                    'cumulative_stocks': simulation_data['cumulative_stocks']
+                }, index=pd.to_datetime(simulation_data['dates']))
             
             # Calculate num_years for display
             num_years = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days / 365.25
@@ -410,6 +428,8 @@ with result_col:
                 st.markdown("### 📊 Investment Return Analysis")
                 
                 # Create the investment return chart
+                import matplotlib.pyplot as plt
+                import matplotlib.dates as mdates
                 fig, ax = plt.subplots(figsize=(12, 8))
                 
                 # Plot both lines
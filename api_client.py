@@ -0,0 +1,73 @@
+import random
+import time
+
+import requests
+
+
+def get_error_detail(response):
+    """Error detail from a FastAPI JSON body, tolerating HTML or empty bodies from proxies"""
+    try:
+        return response.json().get("detail", "Unknown error")
+    except ValueError:
+        return response.reason or "Unknown error"
+
+
+def post_simulation(
+    session,
+    api_base_url,
+    payload,
+    cached=None,
+    connect_timeout=3.05,
+    read_timeout=30.0,
+    max_retries=3,
+    retry_backoff=0.5,
+    deadline_seconds=45.0,
+    sleep=time.sleep,
+    clock=time.monotonic,
+    jitter=random.uniform
+):
+    """
+    POST a simulation request to the backend and return (result, error, etag).
+
+    cached is the (etag, result) of an earlier identical request; it is revalidated with
+    If-None-Match and served again on 304. Connection failures and 5xx responses are
+    retried with full-jitter exponential backoff within deadline_seconds overall. Read
+    timeouts are not retried, since the server is still busy with the original request.
+    """
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    deadline = clock() + deadline_seconds
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        remaining = deadline - clock()
+        try:
+            response = session.post(
+                f"{api_base_url}/simulate",
+                json=payload,
+                headers=headers,
+                timeout=(min(connect_timeout, remaining), min(read_timeout, remaining))
+            )
+
+            if response.status_code == 304 and cached:
+                return cached[1], None, cached[0]
+            if response.status_code == 200:
+                return response.json(), None, response.headers.get("ETag")
+
+            last_error = f"API Error ({response.status_code}): {get_error_detail(response)}"
+            if response.status_code < 500:
+                return None, last_error, None
+
+        except requests.exceptions.ReadTimeout:
+            return None, "API request timed out. The server might be overloaded.", None
+        except requests.exceptions.ConnectionError:
+            last_error = f"Could not connect to FastAPI server. Make sure it's running on {api_base_url}"
+        except Exception as e:
+            return None, f"Error calling API: {str(e)}", None
+
+        # Stop if the next attempt could not even connect before the deadline
+        backoff = jitter(0, retry_backoff * (2 ** attempt))
+        if attempt == max_retries or clock() + backoff + connect_timeout >= deadline:
+            break
+        sleep(backoff)
+
+    return None, last_error, None
@@ -1,17 +1,56 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-from datetime import datetime, date
-import pandas as pd
-import yfinance as yf
+from datetime import datetime, date, timedelta
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import logging
+import re
+from contextlib import asynccontextmanager
 from typing import Optional
-import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# pandas, yfinance and the price index are heavy to load, so they are loaded on first use
+# (or by the background warm-up) rather than at module load.
+# status: "warming_up" -> "ready" | "degraded" (indexes load lazily instead) | "failed" (engine unusable)
+engine_state = {"status": "warming_up", "detail": None}
+
+def warm_up_engine():
+    """Import the data/compute stack and load persisted price indexes so the first /simulate call doesn't pay for it"""
+    try:
+        import price_index
+    except Exception as e:
+        logger.exception("Engine warm-up failed: could not import the simulation engine")
+        engine_state.update(status="failed", detail=f"Engine import failed: {str(e)}")
+        return
+
+    try:
+        price_index.load_persisted_indexes()
+    except Exception as e:
+        logger.exception("Engine warm-up could not preload price indexes")
+        engine_state.update(status="degraded", detail=f"Price index preload failed: {str(e)}")
+        return
+
+    engine_state.update(status="ready", detail=None)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=warm_up_engine, name="engine-warm-up", daemon=True).start()
+    yield
 
 app = FastAPI(
     title="Investment Simulator API",
     description="API for simulating stock investment scenarios using historical data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# simulation_data carries several daily series, so it compresses very well
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 class InvestmentRequest(BaseModel):
     ticker: str
     start_date: date
@@ -30,6 +69,76 @@ class InvestmentResponse(BaseModel):
     num_months: int
     simulation_data: Optional[dict] = None
 
+class ResultCache:
+    """LRU cache of serialized /simulate responses, bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+            self._entries[key] = (etag, body)
+            self.total_bytes += len(body)
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+result_cache = ResultCache()
+
+def get_price_data_version(ticker: str, end_date: date):
+    """Version of the ticker's price index, so cached responses expire when a refresh changes prices"""
+    import price_index
+    return price_index.get_data_version(ticker, end_date)
+
+def normalize_request(request: InvestmentRequest):
+    """Canonical form of a request so equivalent inputs share a cache entry"""
+    return {
+        "ticker": request.ticker.strip().upper(),
+        "start_date": request.start_date.isoformat(),
+        "end_date": request.end_date.isoformat(),
+        "monthly_investment_amount": float(request.monthly_investment_amount),
+        "starting_amount": float(request.starting_amount),
+        "day_of_investment": int(request.day_of_investment)
+    }
+
+# Exchange symbols like AAPL, BRK-B, ^GSPC or EURUSD=X; tickers also name index files on disk
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.^=-]{1,15}$")
+
+def request_cache_key(normalized: dict, data_version: str):
+    """Content hash of the normalized request plus the price data version"""
+    canonical = json.dumps({"request": normalized, "data_version": data_version}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def etag_matches(if_none_match: Optional[str], etag: str):
+    """Weak comparison, as RFC 9110 requires for If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
 def simulate_investment(
     ticker: str,
     start_date: date,
@@ -38,52 +147,33 @@ def simulate_investment(
     starting_amount: float,
     day_of_investment: int
 ):
-    """Core investment simulation logic extracted from Streamlit app"""
+    """Core investment simulation logic, answered from the precomputed per-ticker price index"""
+    import numpy as np
+    import price_index
+
     try:
-        # Download stock data
-        stock_data = yf.download(ticker, start=pd.to_datetime(start_date) - pd.Timedelta(days=7), end=end_date)
-        
-        if stock_data.empty:
-            raise ValueError(f"No data found for ticker {ticker}")
-        
-        # Prepare data
-        stock_data = stock_data[['Close']].round(2)
-        date_range = pd.date_range(start=pd.to_datetime(start_date) - pd.Timedelta(days=7), end=end_date)
-        stock_data = stock_data.reindex(date_range)
-        stock_data.fillna(method='ffill', inplace=True)
-        stock_data = stock_data[(stock_data.index >= pd.to_datetime(start_date)) & (stock_data.index <= pd.to_datetime(end_date))]
-        stock_data.columns = ['Close']
-
-        # Add investment columns
-        stock_data['start_inv_amt'] = starting_amount
-        stock_data['mnth_inv_amt'] = 0.0
-        for date_idx in stock_data.index:
-            if date_idx.day == day_of_investment:
-                stock_data.at[date_idx, 'mnth_inv_amt'] = monthly_investment_amount
-        stock_data.at[stock_data.index[0], 'mnth_inv_amt'] += starting_amount
-
-        # Calculate performance metrics
-        stock_data['stocks_purchased'] = stock_data['mnth_inv_amt'] / stock_data['Close']
-        stock_data['cumulative_stocks'] = stock_data['stocks_purchased'].cumsum()
-        stock_data['total_value'] = stock_data['cumulative_stocks'] * stock_data['Close']
-        stock_data['total_investment'] = stock_data['mnth_inv_amt'].cumsum()
+        # Daily prices and cumulative positions for the window, straight from the index
+        close_prices, cumulative_stocks, total_investment, data_version = price_index.query_investment(
+            ticker, start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment
+        )
+        total_value = cumulative_stocks * close_prices
 
         # Calculate summary metrics
-        total_invested_amount = stock_data['total_investment'].iloc[-1]
-        final_investment_value = stock_data['total_value'].iloc[-1]
+        total_invested_amount = total_investment[-1]
+        final_investment_value = total_value[-1]
         total_return = final_investment_value - total_invested_amount
         percentage_return = (total_return / total_invested_amount) * 100
-        num_years = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days / 365.25
+        num_years = (end_date - start_date).days / 365.25
         cagr = ((final_investment_value / total_invested_amount) ** (1 / num_years) - 1) * 100
-        num_months = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days // 30
+        num_months = (end_date - start_date).days // 30
 
         # Prepare time series data for response
         simulation_data = {
-            "dates": stock_data.index.strftime('%Y-%m-%d').tolist(),
-            "close_prices": stock_data['Close'].tolist(),
-            "total_value": stock_data['total_value'].tolist(),
-            "total_investment": stock_data['total_investment'].tolist(),
-            "cumulative_stocks": stock_data['cumulative_stocks'].tolist()
+            "dates": np.arange(np.datetime64(start_date), np.datetime64(end_date + timedelta(days=1))).astype(str).tolist(),
+            "close_prices": close_prices.tolist(),
+            "total_value": total_value.tolist(),
+            "total_investment": total_investment.astype(float).tolist(),
+            "cumulative_stocks": cumulative_stocks.tolist()
         }
 
         return {
@@ -93,7 +183,8 @@ def simulate_investment(
             "percentage_return": float(percentage_return),
             "cagr": float(cagr),
             "num_months": int(num_months),
-            "simulation_data": simulation_data
+            "simulation_data": simulation_data,
+            "data_version": data_version
         }
 
     except Exception as e:
@@ -107,41 +198,78 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    # Degraded still serves traffic: indexes that failed to preload are loaded on demand
+    if engine_state["status"] not in ("ready", "degraded"):
+        response.status_code = 503
+    return dict(engine_state)
+
 @app.post("/simulate", response_model=InvestmentResponse)
-async def simulate_investment_endpoint(request: InvestmentRequest):
+def simulate_investment_endpoint(request: InvestmentRequest, if_none_match: Optional[str] = Header(None)):
     """
-    Simulate investment strategy for a given stock ticker and parameters
+    Simulate investment strategy for a given stock ticker and parameters.
+    Responses are cached per normalized request and carry an ETag for conditional reruns.
+    A plain def, so FastAPI runs it in its threadpool: price index downloads, disk I/O and
+    lock waits must not block the event loop that serves /health and /ready.
     """
     try:
         # Validate inputs
         if request.start_date >= request.end_date:
             raise HTTPException(status_code=400, detail="Start date must be before end date")
         
+        if request.end_date > date.today():
+            raise HTTPException(status_code=400, detail="End date cannot be in the future")
+        
         if request.day_of_investment < 1 or request.day_of_investment > 31:
             raise HTTPException(status_code=400, detail="Day of investment must be between 1 and 31")
         
         if request.monthly_investment_amount < 0 or request.starting_amount < 0:
             raise HTTPException(status_code=400, detail="Investment amounts must be positive")
 
-        # Run simulation
-        result = simulate_investment(
-            ticker=request.ticker.upper(),
-            start_date=request.start_date,
-            end_date=request.end_date,
-            monthly_investment_amount=request.monthly_investment_amount,
-            starting_amount=request.starting_amount,
-            day_of_investment=request.day_of_investment
-        )
+        normalized = normalize_request(request)
+        if not TICKER_PATTERN.match(normalized["ticker"]):
+            raise HTTPException(status_code=400, detail="Invalid ticker symbol")
 
-        return InvestmentResponse(
-            ticker=request.ticker.upper(),
-            **result
-        )
+        cache_key = request_cache_key(normalized, get_price_data_version(normalized["ticker"], request.end_date))
+        cached = result_cache.get(cache_key)
+
+        if cached is None:
+            # Run simulation
+            result = simulate_investment(
+                ticker=normalized["ticker"],
+                start_date=request.start_date,
+                end_date=request.end_date,
+                monthly_investment_amount=request.monthly_investment_amount,
+                starting_amount=request.starting_amount,
+                day_of_investment=request.day_of_investment
+            )
+
+            # Key the body by the version it was actually computed from; a refresh may have
+            # landed between the lookup above and the simulation
+            data_version = result.pop("data_version")
+            body = InvestmentResponse(
+                ticker=normalized["ticker"],
+                **result
+            ).model_dump_json().encode("utf-8")
+            # Weak because GZipMiddleware may serve the same entity with a different encoding
+            etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+            result_cache.put(request_cache_key(normalized, data_version), etag, body)
+        else:
+            etag, body = cached
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,285 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# Where per-ticker indexes are persisted between restarts
+PRICE_INDEX_DIR = os.environ.get("PRICE_INDEX_DIR", "price_index")
+# A ticker with all 31 tables is ~10 MB, so only keep the most recently used in memory
+MAX_LOADED_INDEXES = int(os.environ.get("PRICE_INDEX_MAX_LOADED", "32"))
+
+_indexes = OrderedDict()
+_ticker_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _days_of_month(first_ordinal, start, stop):
+    """Day of month for calendar offsets [start, stop) counted from first_ordinal"""
+    first = np.datetime64(date.fromordinal(first_ordinal), "D")
+    days = first + np.arange(start, stop)
+    return (days - days.astype("datetime64[M]")).astype(int) + 1
+
+
+def _download_closes(ticker, **kwargs):
+    """Daily closes from yfinance, rounded like the original simulator"""
+    data = yf.download(ticker, **kwargs)
+    if data.empty:
+        # yfinance returns an empty frame on network errors and rate limits too
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+    close = data[['Close']].iloc[:, 0].dropna().round(2)
+    if close.index.tz is not None:
+        close.index = close.index.tz_localize(None)
+    return close
+
+
+class PriceIndex:
+    """
+    Calendar-day price series for one ticker plus, per day_of_investment,
+    prefix sums of shares-per-dollar and contribution counts.
+
+    With these, any start/end/amount query is a handful of array lookups:
+    shares bought between offsets s and e for $1 a month is spd[e] - spd[s-1].
+    """
+
+    def __init__(self, ticker, first_ordinal, prices, last_trade_ordinal, fetched_on, tables=None):
+        self.ticker = ticker
+        self.first_ordinal = first_ordinal
+        self.prices = prices
+        self.last_trade_ordinal = last_trade_ordinal
+        self.fetched_on = fetched_on
+        self.tables = tables or {}
+
+    @property
+    def first_date(self):
+        return date.fromordinal(self.first_ordinal)
+
+    def offset(self, day):
+        return day.toordinal() - self.first_ordinal
+
+    def _extend_table(self, day_of_investment, start):
+        """Recompute the prefix tables for one investment day from offset `start` onwards"""
+        spd, cnt = self.tables.get(day_of_investment, (np.empty(0), np.empty(0, dtype=np.int64)))
+        spd, cnt = spd[:start], cnt[:start]
+
+        prices = self.prices[start:]
+        is_contribution = _days_of_month(self.first_ordinal, start, len(self.prices)) == day_of_investment
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares_per_dollar = np.where(is_contribution & (prices > 0), 1.0 / prices, 0.0)
+
+        base_spd = spd[-1] if len(spd) else 0.0
+        base_cnt = cnt[-1] if len(cnt) else 0
+        self.tables[day_of_investment] = (
+            np.concatenate([spd, base_spd + np.cumsum(shares_per_dollar)]),
+            np.concatenate([cnt, base_cnt + np.cumsum(is_contribution, dtype=np.int64)])
+        )
+
+    def table(self, day_of_investment):
+        if day_of_investment not in self.tables:
+            self._extend_table(day_of_investment, 0)
+            self.save()
+        return self.tables[day_of_investment]
+
+    def replace_from(self, start, new_prices):
+        """Swap in prices from offset `start` onwards and update only the affected table tails"""
+        self.prices = np.concatenate([self.prices[:start], new_prices])
+        for day_of_investment in list(self.tables):
+            self._extend_table(day_of_investment, start)
+
+    def needs_refresh(self, end_date):
+        return end_date.toordinal() > self.last_trade_ordinal and self.fetched_on < date.today().toordinal()
+
+    @property
+    def version(self):
+        """Changes whenever stored prices change (every refresh or rebuild moves fetched_on)"""
+        return f"{self.last_trade_ordinal}-{self.fetched_on}"
+
+    def refresh(self):
+        """
+        Fetch prices since the last trading day on record and rebuild the tail incrementally.
+        Returns False without changing anything if the provider has restated history
+        (splits, or dividends with auto_adjust), in which case the index must be rebuilt.
+        A failed download leaves the index untouched so the next request retries.
+        """
+        last_trade = date.fromordinal(self.last_trade_ordinal)
+        today = date.today()
+        close = _download_closes(self.ticker, start=max(self.first_date, last_trade - timedelta(days=7)))
+        if close.empty:
+            # The window starts before last_trade, so a healthy response always has rows
+            return True
+
+        # Compare a settled close we already hold; last_trade itself may have been fetched intraday
+        settled = close[close.index < pd.Timestamp(last_trade)]
+        check = settled if not settled.empty else close[close.index == pd.Timestamp(last_trade)]
+        if not check.empty:
+            check_day = check.index[-1].date()
+            if not np.isclose(check.iloc[-1], self.prices[self.offset(check_day)], rtol=0, atol=0.011):
+                return False
+        close = close[close.index >= pd.Timestamp(last_trade)]
+
+        calendar = pd.date_range(start=last_trade, end=max(today, last_trade))
+        new_prices = close.reindex(calendar).to_numpy(dtype=float)
+        if np.isnan(new_prices[0]):
+            new_prices[0] = self.prices[self.offset(last_trade)]
+        new_prices = pd.Series(new_prices).ffill().to_numpy()
+
+        if not close.empty:
+            self.last_trade_ordinal = max(self.last_trade_ordinal, close.index[-1].date().toordinal())
+        self.fetched_on = today.toordinal()
+        self.replace_from(self.offset(last_trade), new_prices)
+        self.save()
+        return True
+
+    def pad_to(self, end_date):
+        """Carry the last price forward to end_date (never past today) so recent queries are covered"""
+        missing = self.offset(min(end_date, date.today())) + 1 - len(self.prices)
+        if missing > 0:
+            self.replace_from(len(self.prices), np.full(missing, self.prices[-1]))
+
+    def query(self, start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment):
+        """
+        Cumulative shares and invested amount for every day in [start_date, end_date].
+        The final values only need the last element, so they are O(1) to compute.
+        """
+        s, e = self.offset(start_date), self.offset(end_date)
+        if s < 0:
+            raise ValueError(f"No data found for ticker {self.ticker} before {self.first_date.isoformat()}")
+        if e >= len(self.prices):
+            raise ValueError(f"No data found for ticker {self.ticker} after {date.fromordinal(self.first_ordinal + len(self.prices) - 1).isoformat()}")
+
+        spd, cnt = self.table(day_of_investment)
+        spd_before = spd[s - 1] if s > 0 else 0.0
+        cnt_before = cnt[s - 1] if s > 0 else 0
+
+        start_price = self.prices[s]
+        start_shares = starting_amount / start_price if start_price > 0 else 0.0
+
+        prices = self.prices[s:e + 1]
+        cumulative_stocks = start_shares + monthly_investment_amount * (spd[s:e + 1] - spd_before)
+        total_investment = starting_amount + monthly_investment_amount * (cnt[s:e + 1] - cnt_before)
+        return prices, cumulative_stocks, total_investment
+
+    def save(self):
+        os.makedirs(PRICE_INDEX_DIR, exist_ok=True)
+        arrays = {
+            "first_ordinal": np.int64(self.first_ordinal),
+            "last_trade_ordinal": np.int64(self.last_trade_ordinal),
+            "fetched_on": np.int64(self.fetched_on),
+            "prices": self.prices
+        }
+        for day_of_investment, (spd, cnt) in self.tables.items():
+            arrays[f"spd_{day_of_investment}"] = spd
+            arrays[f"cnt_{day_of_investment}"] = cnt
+
+        path = _index_path(self.ticker)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, ticker):
+        path = _index_path(ticker)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            tables = {}
+            for key in data.files:
+                if key.startswith("spd_"):
+                    day_of_investment = int(key[4:])
+                    tables[day_of_investment] = (data[key], data[f"cnt_{day_of_investment}"])
+            return cls(
+                ticker,
+                int(data["first_ordinal"]),
+                data["prices"],
+                int(data["last_trade_ordinal"]),
+                int(data["fetched_on"]),
+                tables
+            )
+
+    @classmethod
+    def build(cls, ticker):
+        """Download the full price history for a ticker and create an empty index"""
+        close = _download_closes(ticker, period="max")
+        if close.empty:
+            raise ValueError(f"No data found for ticker {ticker}")
+
+        first = close.index[0].date()
+        last_trade = close.index[-1].date()
+        today = date.today()
+        calendar = pd.date_range(start=first, end=max(today, last_trade))
+        prices = close.reindex(calendar).ffill().to_numpy(dtype=float)
+
+        index = cls(ticker, first.toordinal(), prices, last_trade.toordinal(), today.toordinal())
+        index.save()
+        return index
+
+
+def _index_path(ticker):
+    return os.path.join(PRICE_INDEX_DIR, f"{ticker}.npz")
+
+
+def _ticker_lock(ticker):
+    with _registry_lock:
+        return _ticker_locks.setdefault(ticker, threading.Lock())
+
+
+def _remember_index(ticker, index):
+    """Keep an index in the in-memory LRU, evicting the least recently used beyond the limit"""
+    with _registry_lock:
+        _indexes[ticker] = index
+        _indexes.move_to_end(ticker)
+        while len(_indexes) > MAX_LOADED_INDEXES:
+            _indexes.popitem(last=False)
+
+
+def _get_price_index(ticker, end_date):
+    """Return the index for a ticker, building or refreshing it so it covers end_date"""
+    with _registry_lock:
+        index = _indexes.get(ticker)
+    if index is None:
+        index = PriceIndex.load(ticker) or PriceIndex.build(ticker)
+    if index.needs_refresh(end_date) and not index.refresh():
+        index = PriceIndex.build(ticker)
+    index.pad_to(end_date)
+    _remember_index(ticker, index)
+    return index
+
+
+def get_data_version(ticker, end_date):
+    """Version of the prices a query for ticker up to end_date would read, for response caching"""
+    with _ticker_lock(ticker):
+        return _get_price_index(ticker, end_date).version
+
+
+def query_investment(ticker, start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment):
+    """
+    Daily prices, cumulative shares and invested totals for a DCA plan, answered from the index,
+    plus the version of the prices they were computed from (read under the same lock).
+    """
+    with _ticker_lock(ticker):
+        index = _get_price_index(ticker, end_date)
+        prices, cumulative_stocks, total_investment = index.query(
+            start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment
+        )
+        return prices, cumulative_stocks, total_investment, index.version
+
+
+def load_persisted_indexes():
+    """Load the most recently written indexes on disk into memory, used to warm the API on startup"""
+    if not os.path.isdir(PRICE_INDEX_DIR):
+        return
+    filenames = [
+        filename for filename in os.listdir(PRICE_INDEX_DIR)
+        if filename.endswith(".npz") and ".tmp" not in filename
+    ]
+    filenames.sort(key=lambda filename: os.path.getmtime(os.path.join(PRICE_INDEX_DIR, filename)))
+    for filename in filenames[-MAX_LOADED_INDEXES:]:
+        ticker = filename[:-len(".npz")]
+        with _ticker_lock(ticker):
+            with _registry_lock:
+                loaded = ticker in _indexes
+            if not loaded:
+                _remember_index(ticker, PriceIndex.load(ticker))
@@ -1,5 +1,8 @@
 import requests
 import json
+import os
+import subprocess
+import sys
 from datetime import date
 
 # Test the FastAPI endpoint
@@ -29,6 +32,209 @@ def test_investment_api():
         print(f"Error calling API: {e}")
         return None
 
+def fake_simulation(**kwargs):
+    return {
+        "total_invested_amount": 13000.0,
+        "final_investment_value": 15000.0,
+        "total_return": 2000.0,
+        "percentage_return": 15.38,
+        "cagr": 15.38,
+        "num_months": 12,
+        "simulation_data": {"dates": ["2021-01-01"], "close_prices": [132.69]},
+        "data_version": "test-version"
+    }
+
+def test_etag_revalidation(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    calls = []
+    def counting_simulation(**kwargs):
+        calls.append(kwargs)
+        return fake_simulation(**kwargs)
+
+    monkeypatch.setattr(main, "simulate_investment", counting_simulation)
+    monkeypatch.setattr(main, "get_price_data_version", lambda ticker, end_date: "test-version")
+    monkeypatch.setattr(main, "result_cache", main.ResultCache())
+    client = TestClient(main.app)
+
+    payload = {
+        "ticker": " aapl ",
+        "start_date": "2021-01-01",
+        "end_date": "2022-01-01",
+        "monthly_investment_amount": 1000,
+        "starting_amount": 1000,
+        "day_of_investment": 1
+    }
+    first = client.post("/simulate", json=payload)
+    assert first.status_code == 200
+    assert first.json()["ticker"] == "AAPL"
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    # Differently spelled but equivalent request shares the cache entry
+    second = client.post("/simulate", json=dict(payload, ticker="AAPL", monthly_investment_amount=1000.0))
+    assert second.status_code == 200
+    assert second.headers["ETag"] == etag
+    assert len(calls) == 1
+    assert len(main.result_cache._entries) == 1
+
+    # Re-sending the ETag gives 304 with no body
+    revalidated = client.post("/simulate", json=payload, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+
+    stale = client.post("/simulate", json=payload, headers={"If-None-Match": 'W/"stale"'})
+    assert stale.status_code == 200
+
+def test_cache_entry_keyed_by_computed_version(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    # The lookup sees the old version, but a refresh lands before the simulation runs
+    def refreshed_simulation(**kwargs):
+        return dict(fake_simulation(**kwargs), data_version="new-version")
+
+    monkeypatch.setattr(main, "simulate_investment", refreshed_simulation)
+    monkeypatch.setattr(main, "get_price_data_version", lambda ticker, end_date: "old-version")
+    monkeypatch.setattr(main, "result_cache", main.ResultCache())
+    client = TestClient(main.app)
+
+    payload = {
+        "ticker": "AAPL",
+        "start_date": "2021-01-01",
+        "end_date": "2022-01-01",
+        "monthly_investment_amount": 1000,
+        "starting_amount": 1000,
+        "day_of_investment": 1
+    }
+    assert client.post("/simulate", json=payload).status_code == 200
+
+    normalized = {
+        "ticker": "AAPL",
+        "start_date": "2021-01-01",
+        "end_date": "2022-01-01",
+        "monthly_investment_amount": 1000.0,
+        "starting_amount": 1000.0,
+        "day_of_investment": 1
+    }
+    assert main.result_cache.get(main.request_cache_key(normalized, "old-version")) is None
+    assert main.result_cache.get(main.request_cache_key(normalized, "new-version")) is not None
+
+def test_future_end_date_rejected():
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    payload = {
+        "ticker": "AAPL",
+        "start_date": "2021-01-01",
+        "end_date": "2100-01-01",
+        "monthly_investment_amount": 1000,
+        "starting_amount": 1000,
+        "day_of_investment": 1
+    }
+    response = client.post("/simulate", json=payload)
+    assert response.status_code == 400
+    assert "future" in response.json()["detail"]
+
+def test_invalid_ticker_rejected(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("price data must not be touched for an invalid ticker")
+
+    monkeypatch.setattr(main, "get_price_data_version", unexpected)
+    monkeypatch.setattr(main, "simulate_investment", unexpected)
+    client = TestClient(main.app)
+
+    for ticker in ["../X", "/etc/X", "A B", "", "X" * 16]:
+        payload = {
+            "ticker": ticker,
+            "start_date": "2021-01-01",
+            "end_date": "2022-01-01",
+            "monthly_investment_amount": 1000,
+            "starting_amount": 1000,
+            "day_of_investment": 1
+        }
+        response = client.post("/simulate", json=payload)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid ticker symbol"
+
+    for ticker in ["BRK-B", "^GSPC", "EURUSD=X", "BRK.B"]:
+        assert main.TICKER_PATTERN.match(ticker)
+
+def test_result_cache_eviction():
+    from main import ResultCache
+
+    # Entry limit evicts the least recently used key
+    cache = ResultCache(max_entries=2, max_bytes=1000)
+    cache.put("a", "etag-a", b"a" * 10)
+    cache.put("b", "etag-b", b"b" * 10)
+    cache.get("a")
+    cache.put("c", "etag-c", b"c" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == ("etag-a", b"a" * 10)
+    assert cache.get("c") is not None
+
+    # Byte limit evicts until the total fits, and oversized bodies are never stored
+    cache = ResultCache(max_entries=10, max_bytes=100)
+    cache.put("a", "etag-a", b"a" * 60)
+    cache.put("b", "etag-b", b"b" * 60)
+    assert cache.get("a") is None
+    assert cache.total_bytes == 60
+    cache.put("huge", "etag-huge", b"h" * 101)
+    assert cache.get("huge") is None
+    assert cache.total_bytes == 60
+
+def test_startup_time(max_seconds=2.0):
+    # Time a cold import of the API module in a fresh interpreter
+    script = (
+        "import time, sys\n"
+        "t = time.perf_counter()\n"
+        "import main\n"
+        "print(time.perf_counter() - t)\n"
+        "print('pandas' in sys.modules or 'yfinance' in sys.modules)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout.split()
+    elapsed = float(output[0])
+    heavy_modules_loaded = output[1] == "True"
+    print(f"API import time: {elapsed * 1000:.1f} ms")
+    print(f"pandas/yfinance loaded at import: {heavy_modules_loaded}")
+    
+    assert not heavy_modules_loaded
+    assert elapsed < max_seconds
+
+def test_readiness_reports_warm_up_failure(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    import price_index
+
+    def broken_preload():
+        raise OSError("corrupt index file")
+
+    monkeypatch.setattr(price_index, "load_persisted_indexes", broken_preload)
+    monkeypatch.setattr(main, "engine_state", {"status": "warming_up", "detail": None})
+    client = TestClient(main.app)
+
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    # A failed preload is logged and reported, and the API still serves (indexes load lazily)
+    main.warm_up_engine()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert "corrupt index file" in response.json()["detail"]
+
 if __name__ == "__main__":
     # Test the API
     print("Testing Investment Simulator API...")
@@ -42,3 +248,7 @@ if __name__ == "__main__":
         print(f"Total Return: ${result['total_return']:,.2f}")
         print(f"Percentage Return: {result['percentage_return']:.2f}%")
         print(f"CAGR: {result['cagr']:.2f}%")
+    
+    print("\nBenchmarking API startup...")
+    test_startup_time()
+
@@ -0,0 +1,141 @@
+import requests
+
+from api_client import post_simulation
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None, reason=""):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.reason = reason
+
+    def json(self):
+        if not isinstance(self.body, dict):
+            raise ValueError("not JSON")
+        return self.body
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSession:
+    """Plays back queued responses or exceptions, each taking `elapsed` seconds on the clock"""
+
+    def __init__(self, clock, outcomes, elapsed=0.1):
+        self.clock = clock
+        self.outcomes = list(outcomes)
+        self.elapsed = elapsed
+        self.calls = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.calls.append({"url": url, "headers": headers, "timeout": timeout})
+        self.clock.now += self.elapsed
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+PAYLOAD = {"ticker": "AAPL"}
+
+
+def call(session, clock, **kwargs):
+    options = dict(sleep=clock.sleep, clock=clock, jitter=lambda low, high: high)
+    options.update(kwargs)
+    return post_simulation(session, "http://api", PAYLOAD, **options)
+
+
+def test_server_error_retried_then_succeeds():
+    clock = FakeClock()
+    session = FakeSession(clock, [
+        FakeResponse(503, "<html>Bad Gateway</html>", reason="Service Unavailable"),
+        FakeResponse(500, {"detail": "boom"}),
+        FakeResponse(200, {"ticker": "AAPL"}, headers={"ETag": 'W/"abc"'})
+    ])
+
+    result, error, etag = call(session, clock)
+
+    assert (result, error, etag) == ({"ticker": "AAPL"}, None, 'W/"abc"')
+    assert len(session.calls) == 3
+    assert clock.sleeps == [0.5, 1.0]
+
+
+def test_client_error_not_retried():
+    clock = FakeClock()
+    session = FakeSession(clock, [FakeResponse(400, {"detail": "Invalid ticker symbol"})])
+
+    result, error, etag = call(session, clock)
+
+    assert result is None
+    assert error == "API Error (400): Invalid ticker symbol"
+    assert len(session.calls) == 1
+
+
+def test_html_error_body_falls_back_to_reason():
+    clock = FakeClock()
+    session = FakeSession(clock, [FakeResponse(502, "<html>proxy</html>", reason="Bad Gateway")])
+
+    result, error, etag = call(session, clock, max_retries=0)
+
+    assert error == "API Error (502): Bad Gateway"
+
+
+def test_read_timeout_not_retried():
+    clock = FakeClock()
+    session = FakeSession(clock, [requests.exceptions.ReadTimeout()])
+
+    result, error, etag = call(session, clock)
+
+    assert result is None
+    assert "timed out" in error
+    assert len(session.calls) == 1
+
+
+def test_connection_error_retried():
+    clock = FakeClock()
+    session = FakeSession(clock, [
+        requests.exceptions.ConnectTimeout(),
+        requests.exceptions.ConnectionError(),
+        FakeResponse(200, {"ticker": "AAPL"})
+    ])
+
+    result, error, etag = call(session, clock)
+
+    assert result == {"ticker": "AAPL"}
+    assert len(session.calls) == 3
+
+
+def test_deadline_cuts_retries_short():
+    clock = FakeClock()
+    session = FakeSession(clock, [FakeResponse(503, {"detail": "busy"})] * 4, elapsed=4.0)
+
+    result, error, etag = call(session, clock, deadline_seconds=10.0, connect_timeout=1.0)
+
+    # 4s + 0.5s backoff, 4s, then 1s backoff + 1s connect would pass the 10s deadline
+    assert len(session.calls) == 2
+    assert error == "API Error (503): busy"
+    assert clock.now <= 10.0
+    # Later attempts only get the time left before the deadline
+    assert session.calls[1]["timeout"] == (1.0, 5.5)
+
+
+def test_not_modified_served_from_cache():
+    clock = FakeClock()
+    session = FakeSession(clock, [FakeResponse(304)])
+    cached = ('W/"abc"', {"ticker": "AAPL"})
+
+    result, error, etag = call(session, clock, cached=cached)
+
+    assert (result, error, etag) == ({"ticker": "AAPL"}, None, 'W/"abc"')
+    assert session.calls[0]["headers"] == {"If-None-Match": 'W/"abc"'}
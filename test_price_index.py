@@ -0,0 +1,187 @@
+import time
+import types
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_index
+
+
+class FakeProvider:
+    """Stands in for yf.download: serves a Close series, with yfinance's exclusive `end`"""
+
+    def __init__(self, closes):
+        self.closes = closes
+
+    def download(self, ticker, period=None, start=None, end=None, **kwargs):
+        closes = self.closes
+        if start is not None:
+            closes = closes[closes.index >= pd.Timestamp(start)]
+        if end is not None:
+            closes = closes[closes.index < pd.Timestamp(end)]
+        return pd.DataFrame({"Close": closes})
+
+
+def random_walk(start, end, seed=0):
+    days = pd.bdate_range(start, end)
+    rng = np.random.default_rng(seed)
+    return pd.Series(np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days)))), 2), index=days)
+
+
+@pytest.fixture
+def provider(monkeypatch, tmp_path):
+    fake = FakeProvider(random_walk("2000-01-03", "2021-12-31"))
+    monkeypatch.setattr(price_index, "yf", types.SimpleNamespace(download=fake.download))
+    monkeypatch.setattr(price_index, "PRICE_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(price_index, "_indexes", OrderedDict())
+    return fake
+
+
+def dataframe_simulation(provider, ticker, start_date, end_date, monthly_investment_amount, starting_amount, day_of_investment):
+    """The original per-request DataFrame algorithm, kept here as the reference"""
+    stock_data = provider.download(ticker, start=pd.to_datetime(start_date) - pd.Timedelta(days=7), end=end_date)
+    stock_data = stock_data[['Close']].round(2)
+    date_range = pd.date_range(start=pd.to_datetime(start_date) - pd.Timedelta(days=7), end=end_date)
+    stock_data = stock_data.reindex(date_range).ffill()
+    stock_data = stock_data[(stock_data.index >= pd.to_datetime(start_date)) & (stock_data.index <= pd.to_datetime(end_date))]
+
+    stock_data['mnth_inv_amt'] = 0.0
+    for date_idx in stock_data.index:
+        if date_idx.day == day_of_investment:
+            stock_data.at[date_idx, 'mnth_inv_amt'] = monthly_investment_amount
+    stock_data.at[stock_data.index[0], 'mnth_inv_amt'] += starting_amount
+
+    stock_data['stocks_purchased'] = stock_data['mnth_inv_amt'] / stock_data['Close']
+    stock_data['cumulative_stocks'] = stock_data['stocks_purchased'].cumsum()
+    stock_data['total_value'] = stock_data['cumulative_stocks'] * stock_data['Close']
+    stock_data['total_investment'] = stock_data['mnth_inv_amt'].cumsum()
+    return stock_data
+
+
+@pytest.mark.parametrize("start_date, end_date, day_of_investment", [
+    (date(2005, 3, 4), date(2015, 6, 1), 1),
+    (date(2010, 1, 31), date(2020, 12, 31), 31),
+    (date(2012, 2, 29), date(2016, 3, 1), 29),
+    (date(2012, 2, 29), date(2013, 1, 15), 15),
+    (date(2000, 1, 3), date(2000, 2, 1), 3),
+])
+def test_query_matches_dataframe_algorithm(provider, start_date, end_date, day_of_investment):
+    prices, cumulative_stocks, total_investment, _ = price_index.query_investment(
+        "TEST", start_date, end_date, 500.0, 1000.0, day_of_investment
+    )
+
+    # The index uses the end date's own close, where the old code's exclusive yfinance `end`
+    # carried the previous close forward; shift the reference end by a day to line them up
+    reference = dataframe_simulation(provider, "TEST", start_date, end_date + timedelta(days=1), 500.0, 1000.0, day_of_investment)
+    reference = reference.iloc[:-1]
+
+    assert len(prices) == len(reference)
+    np.testing.assert_allclose(prices, reference['Close'])
+    np.testing.assert_allclose(cumulative_stocks, reference['cumulative_stocks'])
+    np.testing.assert_allclose(total_investment, reference['total_investment'])
+    np.testing.assert_allclose(cumulative_stocks * prices, reference['total_value'])
+
+
+def test_incremental_refresh_matches_full_build(provider):
+    full_history = provider.closes
+    provider.closes = full_history[full_history.index < pd.Timestamp("2021-06-01")]
+    price_index.query_investment("TEST", date(2020, 1, 1), date(2021, 5, 1), 100.0, 0.0, 10)
+    old_version = price_index.get_data_version("TEST", date(2021, 5, 1))
+
+    # New prices arrive on a later day
+    provider.closes = full_history
+    price_index._indexes["TEST"].fetched_on -= 1
+    refreshed_version = price_index.get_data_version("TEST", date(2021, 12, 31))
+    refreshed = price_index._indexes["TEST"]
+    assert refreshed.last_trade_ordinal == date(2021, 12, 31).toordinal()
+
+    rebuilt = price_index.PriceIndex.build("TEST")
+    np.testing.assert_array_equal(refreshed.prices, rebuilt.prices)
+    np.testing.assert_allclose(refreshed.table(10)[0], rebuilt.table(10)[0])
+    assert refreshed_version != old_version
+
+
+def test_refresh_rebuilds_after_split(provider):
+    days = pd.bdate_range("2020-01-01", date.today() - timedelta(days=30))
+    provider.closes = pd.Series(100.0, index=days)
+    price_index.query_investment("TEST", date(2020, 1, 1), days[-1].date(), 1000.0, 0.0, 1)
+    old_version = price_index.get_data_version("TEST", days[-1].date())
+
+    # 4:1 split: the provider restates the whole history and new days trade at the new scale
+    new_days = pd.bdate_range(days[-1] + pd.Timedelta(days=1), date.today())
+    provider.closes = pd.concat([pd.Series(25.0, index=days), pd.Series(25.0, index=new_days)])
+    price_index._indexes["TEST"].fetched_on -= 1
+
+    prices, cumulative_stocks, total_investment, _ = price_index.query_investment(
+        "TEST", date(2020, 1, 1), date.today(), 1000.0, 0.0, 1
+    )
+    assert cumulative_stocks[-1] * prices[-1] == pytest.approx(total_investment[-1])
+    assert price_index.get_data_version("TEST", date.today()) != old_version
+
+    # The corrected index is what gets persisted
+    persisted = price_index.PriceIndex.load("TEST")
+    assert np.all(persisted.prices == 25.0)
+
+
+def test_failed_refresh_keeps_index_and_retries(provider):
+    full_history = provider.closes
+    price_index.query_investment("TEST", date(2010, 1, 1), date(2020, 1, 1), 100.0, 0.0, 1)
+    index = price_index._indexes["TEST"]
+    index.fetched_on -= 1
+    stale_version = index.version
+    stale_prices = index.prices.copy()
+
+    # Provider outage: yfinance hands back an empty frame
+    provider.closes = full_history.iloc[:0]
+    prices, _, _, version = price_index.query_investment("TEST", date(2010, 1, 1), date.today(), 100.0, 0.0, 1)
+    assert len(prices) == index.offset(date.today()) - index.offset(date(2010, 1, 1)) + 1
+    assert version == index.version == stale_version
+    np.testing.assert_array_equal(index.prices, stale_prices)
+    assert index.needs_refresh(date.today())
+
+    # The next request after the outage refreshes normally
+    provider.closes = full_history
+    price_index.query_investment("TEST", date(2010, 1, 1), date.today(), 100.0, 0.0, 1)
+    assert index.fetched_on == date.today().toordinal()
+
+
+def test_future_end_date_does_not_grow_index(provider):
+    price_index.query_investment("TEST", date(2010, 1, 1), date(2020, 1, 1), 100.0, 0.0, 1)
+    index = price_index._indexes["TEST"]
+    length = len(index.prices)
+
+    with pytest.raises(ValueError):
+        price_index.query_investment("TEST", date(2010, 1, 1), date(2100, 1, 1), 100.0, 0.0, 1)
+    assert len(index.prices) == length
+    assert index.offset(date.today()) == length - 1
+
+
+def test_loaded_indexes_are_bounded(provider, monkeypatch):
+    monkeypatch.setattr(price_index, "MAX_LOADED_INDEXES", 2)
+    for ticker in ["AAA", "BBB", "CCC"]:
+        price_index.query_investment(ticker, date(2010, 1, 1), date(2011, 1, 1), 100.0, 0.0, 1)
+
+    assert list(price_index._indexes) == ["BBB", "CCC"]
+
+    # Evicted indexes come back from disk
+    price_index.query_investment("AAA", date(2010, 1, 1), date(2011, 1, 1), 100.0, 0.0, 1)
+    assert list(price_index._indexes) == ["CCC", "AAA"]
+
+
+def test_query_compute_is_sub_millisecond(provider):
+    index = price_index.PriceIndex.build("TEST")
+    index.table(15)
+
+    timings = []
+    for i in range(1000):
+        start = time.perf_counter()
+        index.query(date(2001, 1, 1), date(2021, 1, 1), 100.0 + i, 1000.0, 15)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"PriceIndex.query over 20 years p99: {p99 * 1e6:.1f} us")
+    assert p99 < 1e-3